@@ -1,8 +1,14 @@
 
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
 import streamlit as st
+import numpy as np
 import pandas as pd
 import plotly.graph_objs as go
-from scipy.stats import ttest_ind
+from scipy.stats import norm, ttest_ind
 import gdown
 
 # Set page config
@@ -17,13 +23,136 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-# Download CSV from Google Drive
-file_url = "https://drive.google.com/uc?id=1CvjJObXyhuLX5ElQ9PStpXx6rYQWPPpC"
-output = "training_v2.csv"
-gdown.download(file_url, output, quiet=False)
+# Dataset registry: Drive extracts plus any CSV placed in the datasets/ folder
+# (per-site exports, yearly snapshots...). All share the training_v2 schema.
+# Drive extracts are downloaded once to 'path' and then read from disk; use the
+# sidebar "Re-download" button to pick up a changed file on Drive.
+dataset_dir = "datasets"
+datasets = {
+    'training_v2': {
+        'url': "https://drive.google.com/uc?id=1CvjJObXyhuLX5ElQ9PStpXx6rYQWPPpC",
+        'path': "training_v2.csv",
+    },
+}
+if os.path.isdir(dataset_dir):
+    for file_name in sorted(os.listdir(dataset_dir)):
+        if file_name.endswith('.csv'):
+            name = file_name[:-4]
+            if name in datasets:
+                # Don't let a local export hide (or be hidden by) a built-in dataset
+                name = os.path.join(dataset_dir, name)
+                st.sidebar.warning(f"'{file_name}' clashes with an existing dataset name; listed as '{name}'.")
+            datasets[name] = {
+                'url': None,
+                'path': os.path.join(dataset_dir, file_name),
+            }
+
+
+# Dataset version: cached results are recomputed when the file changes
+def dataset_version(path):
+    if not os.path.exists(path):
+        return None
+    return f"{os.path.getmtime(path)}-{os.path.getsize(path)}"
+
+
+class DatasetCache:
+    """Keeps loaded datasets resident within a memory budget.
+
+    Least recently used datasets are evicted first and reloaded from disk
+    (or Drive) the next time they are requested. The cache is shared by all
+    sessions, so `entries` is only touched under `lock`; loading happens
+    outside it, serialised per dataset name. It outlives script reruns, so
+    callers pass each dataset's registry entry in rather than relying on the
+    `datasets` dict of the run that created it.
+    """
+
+    def __init__(self, budget_mb):
+        self.budget_mb = budget_mb
+        self.entries = OrderedDict()  # name -> (version, data, size in bytes)
+        self.lock = threading.Lock()
+        self.load_locks = {}  # name -> lock held while that dataset is loading
+
+    def _used_mb(self):
+        return sum(size for _, _, size in self.entries.values()) / 1024 ** 2
+
+    def snapshot(self):
+        with self.lock:
+            return list(self.entries), self._used_mb()
+
+    def _lookup(self, name, info):
+        version = dataset_version(info['path'])
+        with self.lock:
+            entry = self.entries.get(name)
+            if entry is not None and entry[0] == version:
+                self.entries.move_to_end(name)
+                return entry[0], entry[1]
+        return None
+
+    def get(self, name, info, pinned=()):
+        """Return `(version, data)` for dataset `name` (registry entry `info`),
+        loading it if needed. `version` is the one the data was loaded under,
+        so it is safe to key derived caches on it.
+
+        Datasets in `pinned` (those shown in the current run) are never
+        evicted to make room for it.
+        """
+        hit = self._lookup(name, info)
+        if hit is not None:
+            return hit
+
+        with self.lock:
+            load_lock = self.load_locks.setdefault(name, threading.Lock())
+        with load_lock:
+            # Another session may have loaded it while we were waiting
+            hit = self._lookup(name, info)
+            if hit is not None:
+                return hit
+
+            if not os.path.exists(info['path']) and info['url']:
+                gdown.download(info['url'], info['path'], quiet=False)
+            version = dataset_version(info['path'])
+            data = pd.read_csv(info['path'])
+            size = int(data.memory_usage(deep=True).sum())
 
-# Load data
-data = pd.read_csv(output)
+            with self.lock:
+                self.entries[name] = (version, data, size)
+                self.entries.move_to_end(name)
+                self._evict(keep={name, *pinned})
+        return version, data
+
+    def refresh(self, name, info):
+        """Drop `name` and delete its downloaded copy so the next get() fetches it again."""
+        with self.lock:
+            load_lock = self.load_locks.setdefault(name, threading.Lock())
+        with load_lock:
+            with self.lock:
+                self.entries.pop(name, None)
+            if info['url'] and os.path.exists(info['path']):
+                os.remove(info['path'])
+
+    def _evict(self, keep):
+        used_mb = self._used_mb()
+        for name in list(self.entries):
+            if used_mb <= self.budget_mb:
+                break
+            if name not in keep:
+                used_mb -= self.entries.pop(name)[2] / 1024 ** 2
+
+
+# Memory budget is process-wide, so it is only configurable through the environment
+try:
+    memory_budget_mb = int(os.environ.get('ICU_MEMORY_BUDGET_MB', 1024))
+except ValueError:
+    memory_budget_mb = 1024
+    st.sidebar.warning("ICU_MEMORY_BUDGET_MB is not a whole number; using 1024 MB.")
+
+
+@st.cache_resource
+def get_dataset_cache():
+    return DatasetCache(memory_budget_mb)
+
+
+dataset_cache = get_dataset_cache()
 
 # Toggle theme
 is_dark = st.checkbox("🌙 Dark Mode", value=True)
@@ -68,6 +197,155 @@ categories = {
     }
 }
 
+
+# AUROC ranking (Mann-Whitney with DeLong standard errors)
+def auroc_delong(x, y):
+    """AUROC of x for outcome y (Mann-Whitney) with its DeLong standard error.
+
+    Uses a single argsort over the column; ties get half credit.
+    """
+    order = np.argsort(x, kind='mergesort')
+    xs, ys = x[order], y[order]
+    n1 = int(ys.sum())
+    n0 = len(ys) - n1
+    if n1 == 0 or n0 == 0:
+        return np.nan, np.nan
+
+    # Group equal values into blocks and count deaths / survivors per block
+    starts = np.r_[True, xs[1:] != xs[:-1]]
+    block = np.cumsum(starts) - 1
+    pos_in = np.bincount(block, weights=ys)
+    neg_in = np.bincount(block, weights=1 - ys)
+    pos_before = np.cumsum(pos_in) - pos_in
+    neg_before = np.cumsum(neg_in) - neg_in
+
+    # DeLong structural components, one value per block
+    v10 = (neg_before + 0.5 * neg_in) / n0
+    v01 = (n1 - pos_before - 0.5 * pos_in) / n1
+    auc = np.dot(pos_in, v10) / n1
+
+    s10 = np.dot(pos_in, (v10 - auc) ** 2) / (n1 - 1) if n1 > 1 else 0.0
+    s01 = np.dot(neg_in, (v01 - auc) ** 2) / (n0 - 1) if n0 > 1 else 0.0
+    return auc, np.sqrt(s10 / n1 + s01 / n0)
+
+
+def rank_variable(data, var, desc, category):
+    df = data[['hospital_death', var]].dropna()
+    x = df[var].to_numpy(dtype=float)
+    y = df['hospital_death'].to_numpy(dtype=float)
+    auc, se = auroc_delong(x, y)
+    _, p_value = ttest_ind(x[y == 0], x[y == 1], equal_var=False)
+    z = norm.ppf(0.975)
+    if np.isnan(auc):
+        direction = 'n/a'
+    else:
+        direction = '⬆️ Higher in died' if auc >= 0.5 else '⬇️ Lower in died'
+    return {
+        'Category': category,
+        'Variable': var,
+        'Description': desc,
+        'N': len(df),
+        'AUROC': auc,
+        'SE (DeLong)': se,
+        'CI Low': np.clip(auc - z * se, 0, 1),
+        'CI High': np.clip(auc + z * se, 0, 1),
+        'Discrimination': max(auc, 1 - auc),
+        'Direction': direction,
+        'P-Value': p_value,
+    }
+
+
+@st.cache_data(show_spinner="Ranking variables by AUROC...", max_entries=8)
+def auroc_leaderboard(name, version, _data):
+    jobs = [(_data, var, desc, category)
+            for category, variables in categories.items()
+            for var, desc in variables.items()]
+    with ThreadPoolExecutor() as pool:
+        rows = list(pool.map(lambda job: rank_variable(*job), jobs))
+    board = pd.DataFrame(rows).sort_values('Discrimination', ascending=False)
+    board.insert(0, 'Rank', range(1, len(board) + 1))
+    return board.reset_index(drop=True)
+
+
+# Density curves (binned KDE convolved with FFT, fixed number of grid points)
+kde_points = 512
+kde_tail = 0.001  # share of samples left off each end of the grid
+rug_points = 300
+
+
+def kde_bandwidth(x, rule):
+    sd = x.std(ddof=1) if len(x) > 1 else 0.0
+    if rule == 'Scott':
+        h = 1.06 * sd * len(x) ** -0.2
+    else:
+        iqr = np.subtract(*np.percentile(x, [75, 25])) / 1.34
+        h = 0.9 * (min(sd, iqr) if iqr > 0 else sd) * len(x) ** -0.2
+    # Constant columns still need a positive bandwidth
+    return h if h > 0 else 1.0
+
+
+def fft_kde(x, lo, hi, h):
+    """Gaussian KDE of x on kde_points grid points between lo and hi.
+
+    Samples are linearly binned onto the grid and convolved with the
+    kernel by FFT, so the cost past binning only depends on the grid size.
+    Samples outside the grid are dropped, so the curve's area is the share
+    of samples inside it.
+    """
+    delta = (hi - lo) / (kde_points - 1)
+    pos = (x - lo) / delta
+    pos = pos[(pos >= 0) & (pos <= kde_points - 1)]
+    j = np.minimum(np.floor(pos).astype(int), kde_points - 2)
+    frac = pos - j
+    counts = (np.bincount(j, weights=1 - frac, minlength=kde_points)
+              + np.bincount(j + 1, weights=frac, minlength=kde_points))
+
+    size = 2 * kde_points
+    offsets = np.r_[0:kde_points, -kde_points:0] * delta
+    kernel = norm.pdf(offsets / h)
+    kernel /= kernel.sum() * delta  # sampled kernel integrates to exactly 1
+    density = np.fft.irfft(np.fft.rfft(counts, size) * np.fft.rfft(kernel), size)[:kde_points]
+    return np.clip(density, 0, None) / len(x)
+
+
+def variable_density(data, var, rule):
+    df = data[['hospital_death', var]].dropna()
+    groups = {
+        'survived': df.loc[df['hospital_death'] == 0, var].to_numpy(dtype=float),
+        'died': df.loc[df['hospital_death'] == 1, var].to_numpy(dtype=float),
+    }
+    groups = {outcome: x for outcome, x in groups.items() if len(x)}
+    if not groups:
+        return None
+    bandwidths = {outcome: kde_bandwidth(x, rule) for outcome, x in groups.items()}
+    # Trim extreme tails so a single outlier can't stretch the grid far past the bandwidth
+    pad = 3 * max(bandwidths.values())
+    lo = df[var].quantile(kde_tail) - pad
+    hi = df[var].quantile(1 - kde_tail) + pad
+    # The grid can't resolve kernels narrower than its spacing
+    delta = (hi - lo) / (kde_points - 1)
+    bandwidths = {outcome: max(h, delta) for outcome, h in bandwidths.items()}
+
+    rng = np.random.default_rng(0)
+    curves = {'grid': np.linspace(lo, hi, kde_points)}
+    for outcome, x in groups.items():
+        curves[outcome] = {
+            'density': fft_kde(x, lo, hi, bandwidths[outcome]),
+            'bandwidth': bandwidths[outcome],
+            'quantiles': np.percentile(x, [25, 50, 75]),
+            'rug': rng.choice(x, min(len(x), rug_points), replace=False),
+        }
+    return curves
+
+
+@st.cache_data(show_spinner="Estimating densities...", max_entries=8)
+def kde_curves(name, version, rule, _data):
+    variables = [var for group in categories.values() for var in group]
+    with ThreadPoolExecutor() as pool:
+        densities = pool.map(lambda var: variable_density(_data, var, rule), variables)
+    return dict(zip(variables, densities))
+
+
 # Title centered
 st.markdown(f"""
 <div style='text-align:center;'>
@@ -75,42 +353,117 @@ st.markdown(f"""
 </div>
 """, unsafe_allow_html=True)
 
-# Dropdowns aligned horizontally
-st.markdown("<div style='display:flex; justify-content:center; gap:20px;'>", unsafe_allow_html=True)
-category = st.selectbox("Select Category", list(categories.keys()))
-desc_to_var = {desc: var for var, desc in categories[category].items()}
-selected_desc = st.selectbox("Select Variable", list(desc_to_var.keys()))
-selected_var = desc_to_var[selected_desc]
-st.markdown("</div>", unsafe_allow_html=True)
-
-# Data filtering
-df = data[['hospital_death', selected_var]].dropna()
-survived = df[df['hospital_death'] == 0][selected_var]
-died = df[df['hospital_death'] == 1][selected_var]
-
-# T-Test
-t_stat, p_value = ttest_ind(survived, died, equal_var=False)
-significant = '✅ Yes' if p_value < 0.05 else '❌ No'
-
-# Plot
-fig = go.Figure()
-fig.add_trace(go.Histogram(x=survived, name='Survived', opacity=0.8, marker_color='#00c853'))
-fig.add_trace(go.Histogram(x=died, name='Died', opacity=0.8, marker_color='#ff5252'))
-fig.update_layout(
-    barmode='overlay',
-    title=dict(text=f'<b>{selected_desc}</b>', font=dict(color=font_color)),
-    plot_bgcolor=bg_color,
-    paper_bgcolor=paper_color,
-    font=dict(color=font_color),
-    legend=dict(orientation='h', x=0.35, y=-0.15, font=dict(color=font_color))
-)
+# Dataset selection
+st.sidebar.header("🗂️ Datasets")
+dataset_names = list(datasets.keys())
+primary_dataset = st.sidebar.selectbox("Dataset", dataset_names)
+selected_datasets = [primary_dataset]
+if st.sidebar.checkbox("Compare with another dataset", disabled=len(dataset_names) < 2):
+    other_datasets = [name for name in dataset_names if name != primary_dataset]
+    selected_datasets.append(st.sidebar.selectbox("Compare to", other_datasets))
+comparing = len(selected_datasets) > 1
+for name in selected_datasets:
+    if datasets[name]['url'] and st.sidebar.button(f"🔄 Re-download {name}"):
+        dataset_cache.refresh(name, datasets[name])
+
+# Load the selected datasets once per run; they are pinned so that loading one
+# never evicts the other when comparing. Values are (version, data).
+loaded = {name: dataset_cache.get(name, datasets[name], pinned=selected_datasets) for name in selected_datasets}
+
+# Page selection
+page = st.radio("Page", ["📊 Variable Explorer", "🏆 AUROC Leaderboard"], horizontal=True)
+
+if page == "🏆 AUROC Leaderboard":
+    for column, name in zip(st.columns(len(selected_datasets)), selected_datasets):
+        with column:
+            if comparing:
+                st.subheader(name)
+            version, data = loaded[name]
+            board = auroc_leaderboard(name, version, data)
+            st.dataframe(
+                board.style.format({
+                    'AUROC': '{:.3f}', 'SE (DeLong)': '{:.4f}', 'CI Low': '{:.3f}',
+                    'CI High': '{:.3f}', 'Discrimination': '{:.3f}', 'P-Value': '{:.4g}',
+                }),
+                use_container_width=True,
+                hide_index=True
+            )
+else:
+    # Dropdowns aligned horizontally
+    st.markdown("<div style='display:flex; justify-content:center; gap:20px;'>", unsafe_allow_html=True)
+    category = st.selectbox("Select Category", list(categories.keys()))
+    desc_to_var = {desc: var for var, desc in categories[category].items()}
+    selected_desc = st.selectbox("Select Variable", list(desc_to_var.keys()))
+    selected_var = desc_to_var[selected_desc]
+    st.markdown("</div>", unsafe_allow_html=True)
 
-# Show plot
-st.plotly_chart(fig, use_container_width=True)
+    # Plot options
+    plot_type = st.radio("Plot", ["Histogram", "Density (KDE)"], horizontal=True)
+    if plot_type == "Density (KDE)":
+        bandwidth_rule = st.selectbox("Bandwidth", ["Silverman", "Scott"])
+        markers = st.radio("Markers", ["None", "Quantiles", "Rug"], horizontal=True)
 
-# Summary stats
-summary_html = f'''<div style='text-align:center; font-size:20px; background-color:{box_color}; padding:20px; border-radius:12px; color:{font_color};'>
+    for column, name in zip(st.columns(len(selected_datasets)), selected_datasets):
+        with column:
+            version, data = loaded[name]
+            title = f'<b>{selected_desc}</b>' + (f' — {name}' if comparing else '')
+
+            # Data filtering
+            df = data[['hospital_death', selected_var]].dropna()
+            survived = df[df['hospital_death'] == 0][selected_var]
+            died = df[df['hospital_death'] == 1][selected_var]
+
+            # T-Test
+            t_stat, p_value = ttest_ind(survived, died, equal_var=False)
+            significant = '✅ Yes' if p_value < 0.05 else '❌ No'
+
+            # Plot
+            fig = go.Figure()
+            if plot_type == "Histogram":
+                fig.add_trace(go.Histogram(x=survived, name='Survived', opacity=0.8, marker_color='#00c853'))
+                fig.add_trace(go.Histogram(x=died, name='Died', opacity=0.8, marker_color='#ff5252'))
+            else:
+                curves = kde_curves(name, version, bandwidth_rule, data)[selected_var] or {}
+                for outcome, label, color in [('survived', 'Survived', '#00c853'), ('died', 'Died', '#ff5252')]:
+                    if outcome not in curves:
+                        continue
+                    curve = curves[outcome]
+                    fig.add_trace(go.Scatter(
+                        x=curves['grid'], y=curve['density'], mode='lines', fill='tozeroy',
+                        name=f"{label} (h={curve['bandwidth']:.3g})", line=dict(color=color, width=2)
+                    ))
+                    if markers == "Quantiles":
+                        for q in curve['quantiles']:
+                            fig.add_vline(x=q, line=dict(color=color, dash='dot', width=1))
+                    elif markers == "Rug":
+                        fig.add_trace(go.Scatter(
+                            x=curve['rug'], y=np.zeros(len(curve['rug'])), mode='markers',
+                            marker=dict(symbol='line-ns-open', size=10, color=color),
+                            showlegend=False, hoverinfo='x'
+                        ))
+                fig.update_yaxes(title_text='Density')
+            fig.update_layout(
+                barmode='overlay',
+                title=dict(text=title, font=dict(color=font_color)),
+                plot_bgcolor=bg_color,
+                paper_bgcolor=paper_color,
+                font=dict(color=font_color),
+                legend=dict(orientation='h', x=0.35, y=-0.15, font=dict(color=font_color))
+            )
+
+            # Show plot
+            st.plotly_chart(fig, use_container_width=True)
+
+            # Summary stats
+            summary_html = f'''<div style='text-align:center; font-size:20px; background-color:{box_color}; padding:20px; border-radius:12px; color:{font_color};'>
 <b>🟢 Survived Mean</b>: {survived.mean():.2f}, <b>🔴 Died Mean</b>: {died.mean():.2f}, 
 <b>🎯 P-Value</b>: {p_value:.4f}, <b>Statistically Significant</b>: {significant}
 </div>'''
-st.markdown(summary_html, unsafe_allow_html=True)
+            st.markdown(summary_html, unsafe_allow_html=True)
+
+# Resident datasets
+resident, used_mb = dataset_cache.snapshot()
+st.sidebar.caption(
+    f"In memory: {', '.join(resident) or 'none'} "
+    f"({used_mb:.0f} / {dataset_cache.budget_mb} MB budget, set via ICU_MEMORY_BUDGET_MB)"
+)